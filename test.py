@@ -11,9 +11,22 @@ import argparse
 import time
 import tempfile
 import shutil
+import hashlib
+import functools
+import contextlib
+import shlex
+import signal
+import re
+import itertools
+import threading
 from pathlib import Path
-from typing import List, Optional, Tuple
-import difflib
+from typing import Callable, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+# 持久化缓存目录，保存参考程序等可复用的编译产物
+CACHE_DIR = Path.home() / '.cache' / 'compiler-test'
+# 批量测试结果缓存，输入未变化且上次通过的测试会被跳过
+RESULT_CACHE_FILE = CACHE_DIR / 'results.json'
 
 class Colors:
     """ANSI颜色代码"""
@@ -39,14 +52,48 @@ class Colors:
     BG_YELLOW = '\033[103m'
     BG_BLUE = '\033[104m'
 
+# 输出不是终端时 (重定向到文件、管道) 或设置了NO_COLOR环境变量时不输出颜色代码
+_IS_TTY = sys.stdout.isatty()
+USE_COLOR = _IS_TTY and not os.environ.get('NO_COLOR')
+if not USE_COLOR:
+    for _name in [name for name in vars(Colors) if name.isupper()]:
+        setattr(Colors, _name, '')
+
+# unified diff中各类行的颜色，按行首字符查找
+_DIFF_COLORS = {'-': Colors.RED, '+': Colors.GREEN, '@': Colors.MAGENTA}
+
 def colored_print(text: str, color: str = Colors.RESET, bold: bool = False, end='\n'):
     """打印彩色文本"""
-    prefix = Colors.BOLD if bold else ""
-    print(f"{prefix}{color}{text}{Colors.RESET}", end=end)
+    if not USE_COLOR:
+        print(text, end=end)
+        return
+    print((Colors.BOLD + color if bold else color) + text + Colors.RESET, end=end)
+
+def _emit(lines: List[str]):
+    """将多行文本拼接后一次写入标准输出，并行测试时各块输出不会互相穿插"""
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+
+# 清除当前行的控制序列，预先编码以便直接写入stdout的底层缓冲区
+_CLEAR = b'\r' + b' ' * 80 + b'\r'
+# 批量测试进度条的最小刷新间隔(秒)
+_PROGRESS_INTERVAL = 0.05
+
+def _write_raw(data: bytes):
+    """绕过文本层直接写入stdout的底层缓冲区并刷新"""
+    sys.stdout.flush()  # 先输出文本层中已缓冲的内容，保证顺序
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
 
 def clear_line():
-    """清除当前行"""
-    print('\r' + ' ' * 80 + '\r', end='', flush=True)
+    """清除当前行，输出不是终端时什么也不做"""
+    if _IS_TTY:
+        _write_raw(_CLEAR)
+
+def show_status(text: str):
+    """清除当前行并显示状态文本，整行一次写入；输出不是终端时不显示临时状态"""
+    if _IS_TTY:
+        _write_raw(_CLEAR + text.encode(sys.stdout.encoding or 'utf-8', errors='replace'))
 
 def get_progress_bar(current: int, total: int, width: int = 20) -> str:
     """生成进度条"""
@@ -71,24 +118,73 @@ def get_status_icon(status: str) -> str:
     }
     return icons.get(status, '•')
 
-def run_command(cmd: List[str], input_text: str = "", timeout: int = 60) -> Tuple[int, str, str]:
-    """运行命令并返回退出码、标准输出和标准错误"""
+@functools.lru_cache(maxsize=8)
+def _which(name: str) -> Optional[str]:
+    """查找可执行文件的完整路径，结果在同一次运行中复用，避免每次都扫描PATH"""
+    return shutil.which(name)
+
+def _decode_output(data: bytes) -> str:
+    """解码子进程输出，并像text=True时一样把\r\n和\r统一转换为\n"""
+    return data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+
+# 正在运行的独立会话进程组，终端的Ctrl+C不会发给它们，中断时需要手动结束
+_session_pids = set()
+
+def _kill_sessions():
+    """结束run_command以new_session启动、仍在运行的所有进程组"""
+    for pid in list(_session_pids):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+def run_command(cmd: List[str], input_text: str = "", timeout: int = 60,
+                discard_stdout: bool = False, cwd: Optional[str] = None,
+                new_session: bool = False) -> Tuple[int, str, str]:
+    """运行命令并返回退出码、标准输出和标准错误
+    
+    子进程的输出直接写入临时文件，结束后一次性读取并解码 (换行符统一为\n)，
+    避免输出很大时在内存中缓冲管道数据；discard_stdout为True时标准输出
+    直接丢弃到/dev/null，返回的标准输出为空；new_session为True时命令在新的会话中运行，
+    超时时结束整个进程组，适用于会再启动子进程的shell脚本
+    """
     try:
-        result = subprocess.run(
-            cmd,
-            input=input_text,
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
-        return result.returncode, result.stdout, result.stderr
-    except subprocess.TimeoutExpired:
-        return -1, "", f"Command timed out after {timeout} seconds"
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            # 可执行文件为带目录的路径且close_fds=False时，subprocess改用posix_spawn启动子进程，
+            # 省去fork和逐个关闭文件描述符的开销；Python创建的文件描述符默认不可继承，
+            # 不会因此泄漏到子进程中
+            proc = subprocess.Popen(cmd, executable=_which(cmd[0]), stdin=subprocess.PIPE,
+                                    stdout=subprocess.DEVNULL if discard_stdout else stdout_file,
+                                    stderr=stderr_file, cwd=cwd, close_fds=False,
+                                    start_new_session=new_session)
+            if new_session:
+                _session_pids.add(proc.pid)
+            try:
+                proc.communicate(input_text.encode(), timeout=timeout)
+            except subprocess.TimeoutExpired:
+                if new_session:
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                else:
+                    proc.kill()
+                proc.wait()
+                return -1, "", f"Command timed out after {timeout} seconds"
+            finally:
+                _session_pids.discard(proc.pid)
+            
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            return proc.returncode, _decode_output(stdout_file.read()), _decode_output(stderr_file.read())
     except Exception as e:
         return -1, "", str(e)
 
-def compile_program(compiler_cmd: List[str], source_file: str, asm_file: str, verbose: bool = True, timeout: int = 60) -> bool:
-    """编译程序生成汇编代码"""
+def compile_program(compiler_cmd: List[str], source_file: str, asm_file: str, verbose: bool = True, timeout: int = 60) -> Tuple[bool, str]:
+    """编译程序生成汇编代码
+    Returns:
+        (bool, str): (是否编译成功, 编译器的标准错误输出)
+    """
     if verbose:
         print(f"\n{get_status_icon('compiling')} {Colors.CYAN}{Colors.BOLD}编译源文件{Colors.RESET}")
         print(f"   {Colors.DIM}命令: {' '.join(compiler_cmd + [source_file, '-o', asm_file])}{Colors.RESET}")
@@ -102,23 +198,43 @@ def compile_program(compiler_cmd: List[str], source_file: str, asm_file: str, ve
         if verbose:
             print(f"   {get_status_icon('failed')} {Colors.RED}{Colors.BOLD}编译失败{Colors.RESET}")
             if stderr:
-                print(f"   {Colors.RED}错误信息:{Colors.RESET}")
-                for line in stderr.strip().split('\n'):
-                    print(f"   {Colors.DIM}{line}{Colors.RESET}")
-        return False
+                _emit([f"   {Colors.RED}错误信息:{Colors.RESET}"] +
+                      [f"   {Colors.DIM}{line}{Colors.RESET}" for line in stderr.strip().split('\n')])
+        return False, stderr
     
     # 检查汇编文件是否生成
     if not os.path.exists(asm_file):
         if verbose:
             print(f"   {get_status_icon('failed')} {Colors.RED}{Colors.BOLD}编译失败: 汇编文件未生成{Colors.RESET}")
-        return False
+        return False, "汇编文件未生成"
     
     if verbose:
         print(f"   {get_status_icon('passed')} {Colors.GREEN}编译成功{Colors.RESET} → {Colors.DIM}{os.path.basename(asm_file)}{Colors.RESET}")
-    return True
+    return True, stderr
 
-def assemble_and_link(asm_file: str, lib_path: str, output_file: str, debug: bool = False, verbose: bool = True) -> bool:
-    """汇编并链接程序"""
+def compile_program_batch(compiler_cmd: List[str], source_files: List[str], out_dir: str,
+                          timeout: int = 60) -> List[Optional[str]]:
+    """在一次编译器调用中编译多个源文件，要求编译器不带-o时在当前目录生成<文件名>.s
+    
+    编译器在out_dir中运行，命令中存在的文件路径会先转换为绝对路径
+    Returns:
+        与source_files一一对应的汇编文件路径，编译失败或未生成时为None
+    """
+    cmd = [os.path.abspath(arg) if os.path.exists(arg) else arg for arg in compiler_cmd]
+    cmd += [os.path.abspath(source_file) for source_file in source_files]
+    returncode, stdout, stderr = run_command(cmd, timeout=timeout * len(source_files), cwd=out_dir)
+    if returncode != 0:
+        # 无法确定哪些输出是完整的，全部交给逐个编译
+        return [None] * len(source_files)
+    
+    asm_files = [os.path.join(out_dir, f"{Path(source_file).stem}.s") for source_file in source_files]
+    return [asm_file if os.path.exists(asm_file) else None for asm_file in asm_files]
+
+def assemble_and_link(asm_file: str, lib_path: str, output_file: str, debug: bool = False, verbose: bool = True) -> Tuple[bool, str]:
+    """汇编并链接程序
+    Returns:
+        (bool, str): (是否链接成功, 链接器的标准错误输出)
+    """
     cmd = [
         'riscv64-linux-gnu-gcc',
         '-static',
@@ -143,23 +259,56 @@ def assemble_and_link(asm_file: str, lib_path: str, output_file: str, debug: boo
         if verbose:
             print(f"   {get_status_icon('failed')} {Colors.RED}{Colors.BOLD}链接失败{Colors.RESET}")
             if stderr:
-                print(f"   {Colors.RED}错误信息:{Colors.RESET}")
-                for line in stderr.strip().split('\n'):
-                    print(f"   {Colors.DIM}{line}{Colors.RESET}")
-        return False
+                _emit([f"   {Colors.RED}错误信息:{Colors.RESET}"] +
+                      [f"   {Colors.DIM}{line}{Colors.RESET}" for line in stderr.strip().split('\n')])
+        return False, stderr
     
     if verbose:
         print(f"   {get_status_icon('passed')} {Colors.GREEN}链接成功{Colors.RESET} → {Colors.DIM}{os.path.basename(output_file)}{Colors.RESET}")
-    return True
+    return True, stderr
 
-def run_program(program_path: str, input_text: str = "", simulator: str = "qemu-riscv64", interactive: bool = False) -> Tuple[int, str, str]:
-    """运行程序"""
-    # 首先检查模拟器是否存在
-    if not shutil.which(simulator):
-        colored_print(f"错误: 模拟器 '{simulator}' 不存在或不在PATH中", Colors.RED, bold=True)
-        return -1, "", f"Simulator '{simulator}' not found"
+def build_program(compiler_cmd: List[str], source_file: str, lib_path: str, asm_file: str, program_file: str,
+                  debug: bool = False, verbose: bool = True, use_cache: bool = True,
+                  asm_ready: bool = False) -> Tuple[Optional[str], str]:
+    """编译并链接程序，非调试模式下可执行文件按输入缓存，命中时跳过编译和链接
     
-    cmd = [simulator, program_path]
+    asm_ready为True表示asm_file已由compile_program_batch生成，只需汇编链接
+    Returns:
+        (Optional[str], str): (失败的阶段"编译"/"链接"，成功时为None, 标准错误输出)
+    """
+    cache_file = _artifact_cache_path(source_file, compiler_cmd, lib_path) if use_cache and not debug else None
+    if cache_file is not None:
+        try:
+            shutil.copy2(cache_file, program_file)
+        except OSError:
+            pass
+        else:
+            if verbose:
+                print(f"\n{get_status_icon('info')} {Colors.CYAN}使用缓存的可执行文件{Colors.RESET}")
+            return None, ""
+    
+    if not asm_ready:
+        compiled, stderr = compile_program(compiler_cmd, source_file, asm_file, verbose=verbose)
+        if not compiled:
+            return "编译", stderr
+    
+    linked, stderr = assemble_and_link(asm_file, lib_path, program_file, debug=debug, verbose=verbose)
+    if not linked:
+        return "链接", stderr
+    
+    if cache_file is not None:
+        _store_artifact(program_file, cache_file)
+    return None, stderr
+
+def run_program(program_path: str, input_text: str = "", simulator: str = "qemu-riscv64", interactive: bool = False,
+                simulator_args: Optional[List[str]] = None, discard_stdout: bool = False) -> Tuple[int, str, str]:
+    """运行程序
+    Args:
+        simulator_args: 传给模拟器的额外参数，放在程序路径之前
+        discard_stdout: 丢弃程序的标准输出，只关心退出码和耗时时使用
+    """
+    # 模拟器是否存在已在main中检查过，这里直接使用
+    cmd = [simulator] + (simulator_args or []) + [program_path]
     
     if interactive:
         # 交互式模式
@@ -172,61 +321,133 @@ def run_program(program_path: str, input_text: str = "", simulator: str = "qemu-
             return -1, "", str(e)
     else:
         # 非交互式模式，使用之前的方法
-        return run_command(cmd, input_text)
+        return run_command(cmd, input_text, discard_stdout=discard_stdout)
 
 def compare_output(expected: str, actual: str, show_diff: bool = True) -> bool:
     """比较输出结果"""
     if expected == actual:
         return True
     
-    if show_diff:
-        print(f"\n   {Colors.YELLOW}{Colors.BOLD}输出差异对比:{Colors.RESET}")
-        
-        # 使用系统diff命令
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.expected', delete=False) as expected_file:
-            expected_file.write(expected)
-            expected_file.flush()
-            expected_path = expected_file.name
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.actual', delete=False) as actual_file:
-            actual_file.write(actual)
-            actual_file.flush()
-            actual_path = actual_file.name
-        
-        try:
-            # 使用diff -u命令生成unified diff
-            diff_cmd = ['diff', '-u', '--label=期望输出', '--label=实际输出', expected_path, actual_path]
-            returncode, stdout, stderr = run_command(diff_cmd, timeout=10)
-            
-            if stdout:
-                for line in stdout.split('\n'):
-                    if line.startswith('---'):
-                        print(f"   {Colors.CYAN}{line}{Colors.RESET}")
-                    elif line.startswith('+++'):
-                        print(f"   {Colors.CYAN}{line}{Colors.RESET}")
-                    elif line.startswith('@@'):
-                        print(f"   {Colors.MAGENTA}{line}{Colors.RESET}")
-                    elif line.startswith('-'):
-                        print(f"   {Colors.RED}{line}{Colors.RESET}")
-                    elif line.startswith('+'):
-                        print(f"   {Colors.GREEN}{line}{Colors.RESET}")
-                    elif line.startswith(' '):
-                        print(f"   {line}")
-                    elif line.strip():  # 非空行但不匹配上面的模式
-                        print(f"   {line}")
-        finally:
-            # 清理临时文件
-            try:
-                os.unlink(expected_path)
-                os.unlink(actual_path)
-            except:
-                pass
+    # 不需要显示差异时直接返回，不生成diff
+    if not show_diff:
+        return False
+    
+    print(f"\n   {Colors.YELLOW}{Colors.BOLD}输出差异对比:{Colors.RESET}")
+    
+    # 直接在进程内生成unified diff；difflib只在输出不一致时用到，延迟导入以缩短启动时间
+    import difflib
+    diff_lines = difflib.unified_diff(expected.splitlines(), actual.splitlines(),
+                                      fromfile='期望输出', tofile='实际输出', lineterm='')
+    # 前两行是文件头，其余行按首字符查表着色
+    output = [f"   {Colors.CYAN}{header}{Colors.RESET}" for header in itertools.islice(diff_lines, 2)]
+    for line in diff_lines:
+        color = _DIFF_COLORS.get(line[:1])
+        output.append(f"   {color}{line}{Colors.RESET}" if color else f"   {line}")
+    _emit(output)
     
     return False
 
+def _file_digest(path) -> str:
+    """计算文件内容的sha256摘要"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cache_path(subdir: str, *parts: str) -> Path:
+    """根据输入内容的摘要生成缓存文件路径"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode())
+        h.update(b'\0')
+    return CACHE_DIR / subdir / h.hexdigest()
+
+def _write_cache_file(cache_file: Path, write: Callable[[str], None]):
+    """调用write写入临时文件，再原子替换cache_file，避免并行测试读到不完整的文件"""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(temp_file)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        pass  # 缓存只是加速手段，写入失败不影响测试
+
+def _store_in_cache(src: str, cache_file: Path):
+    """将文件复制到缓存中"""
+    _write_cache_file(cache_file, lambda temp_file: shutil.copy2(src, temp_file))
+
+@functools.lru_cache(maxsize=1)
+def _sylib_paths() -> Tuple[Path, Path]:
+    """运行时库源文件sylib.c和sylib.h的路径"""
+    lib_dir = get_script_dir() / 'lib'
+    return lib_dir / 'sylib.c', lib_dir / 'sylib.h'
+
+@functools.lru_cache(maxsize=1)
+def _sylib_digests() -> Tuple[str, str]:
+    """sylib.c和sylib.h的摘要，同一次运行中只计算一次
+    
+    文件不存在时抛出FileNotFoundError
+    """
+    sylib_c, sylib_h = _sylib_paths()
+    return _file_digest(sylib_c), _file_digest(sylib_h)
+
+def _ref_bin_cache_path(source_file: str, compiler: str) -> Path:
+    """参考程序的缓存路径，由源文件、运行时库和编译器共同决定"""
+    return _cache_path('refbins', _file_digest(source_file), *_sylib_digests(), compiler)
+
+@functools.lru_cache(maxsize=1)
+def _get_sylib_object(compiler: str) -> Optional[str]:
+    """获取预编译的sylib.o，不存在时编译一次并放入缓存，失败时返回None
+    
+    同一次运行中只查找/编译一次
+    """
+    sylib_c, _ = _sylib_paths()
+    sylib_o = _cache_path('sylib', *_sylib_digests(), compiler).with_suffix('.o')
+    if sylib_o.exists():
+        return str(sylib_o)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_object = os.path.join(temp_dir, 'sylib.o')
+        returncode, stdout, stderr = run_command([compiler, '-c', str(sylib_c), '-o', temp_object], timeout=30)
+        if returncode != 0:
+            return None
+        _store_in_cache(temp_object, sylib_o)
+    return str(sylib_o) if sylib_o.exists() else None
+
+# sylib.h中的全局变量定义，生成参考程序时需要改为extern声明
+_SYLIB_DEFINITION_RE = re.compile(r'^((?:struct timeval|int) _sysy_(?:start|l1|h|idx)\b[^;]*;)', re.M)
+
+@functools.lru_cache(maxsize=1)
+def _get_modified_sylib_h() -> str:
+    """读取sylib.h并将其中的变量定义改为extern声明，结果在同一次运行中复用"""
+    _, sylib_h = _sylib_paths()
+    with open(sylib_h, 'r', encoding='utf-8') as f:
+        sylib_h_content = f.read()
+    
+    return _SYLIB_DEFINITION_RE.sub(r'extern \1', sylib_h_content)
+
+def _run_reference_program(program: str, input_text: str, verbose: bool = True) -> Tuple[str, int]:
+    """运行参考程序获取参考输出"""
+    if verbose:
+        print(f"\n{get_status_icon('running')} {Colors.MAGENTA}运行参考程序{Colors.RESET}")
+    
+    ref_returncode, ref_stdout, ref_stderr = run_command([program], input_text, timeout=30)
+    
+    if verbose:
+        print(f"   {get_status_icon('info')}  参考程序退出码: {Colors.BOLD}{ref_returncode}{Colors.RESET}")
+        if ref_stdout:
+            _emit([f"   {Colors.BLUE}{Colors.BOLD}参考输出:{Colors.RESET}"] +
+                  [f"   {line}" for line in ref_stdout.rstrip().split('\n')])
+    
+    return ref_stdout.rstrip('\n') if ref_stdout else "", ref_returncode
+
 def generate_reference_output(source_file: str, input_text: str, verbose: bool = True) -> Tuple[str, int]:
     """使用clang/gcc生成参考输出
     
+    编译出的参考程序按源文件和运行时库的摘要缓存在CACHE_DIR中，
+    内容未变化时直接运行缓存的程序
+    
     Args:
         source_file: 源文件路径
         input_text: 输入内容
@@ -235,20 +456,12 @@ def generate_reference_output(source_file: str, input_text: str, verbose: bool =
     Returns:
         (stdout, returncode): 标准输出和返回值，失败时返回(None, None)
     """
-    script_dir = get_script_dir()
-    sylib_c = script_dir / 'lib' / 'sylib.c'
-    sylib_h = script_dir / 'lib' / 'sylib.h'
-    
-    # 检查运行时库文件是否存在
-    if not sylib_c.exists() or not sylib_h.exists():
-        if verbose:
-            print(f"   {get_status_icon('failed')} {Colors.RED}运行时库文件不存在{Colors.RESET}")
-        return None, None
+    sylib_c, _ = _sylib_paths()
     
     # 优先使用clang，如果不存在则使用gcc
     compiler = None
     for cmd in ['clang', 'gcc']:
-        if shutil.which(cmd):
+        if _which(cmd):
             compiler = cmd
             break
     
@@ -257,16 +470,29 @@ def generate_reference_output(source_file: str, input_text: str, verbose: bool =
             print(f"   {get_status_icon('failed')} {Colors.RED}未找到clang或gcc编译器{Colors.RESET}")
         return None, None
     
+    # 读取源文件内容
+    try:
+        with open(source_file, 'r', encoding='utf-8') as f:
+            source_content = f.read()
+    except Exception as e:
+        if verbose:
+            print(f"   {get_status_icon('failed')} {Colors.RED}读取源文件失败: {e}{Colors.RESET}")
+        return None, None
+    
+    # 计算缓存路径时会读取运行时库文件，顺便检查其是否存在
+    try:
+        cached_program = _ref_bin_cache_path(source_file, compiler)
+    except FileNotFoundError:
+        if verbose:
+            print(f"   {get_status_icon('failed')} {Colors.RED}运行时库文件不存在{Colors.RESET}")
+        return None, None
+    
+    if cached_program.exists():
+        if verbose:
+            print(f"   {get_status_icon('info')}  {Colors.CYAN}使用缓存的参考程序{Colors.RESET}: {Colors.DIM}{cached_program}{Colors.RESET}")
+        return _run_reference_program(str(cached_program), input_text, verbose)
+    
     with tempfile.TemporaryDirectory() as temp_dir:
-        # 读取源文件内容
-        try:
-            with open(source_file, 'r', encoding='utf-8') as f:
-                source_content = f.read()
-        except Exception as e:
-            if verbose:
-                print(f"   {get_status_icon('failed')} {Colors.RED}读取源文件失败: {e}{Colors.RESET}")
-            return None, None
-        
         # 创建临时C文件，添加sylib.h的include并复制源文件内容
         temp_c_file = os.path.join(temp_dir, 'temp_program.c')
         try:
@@ -281,23 +507,7 @@ def generate_reference_output(source_file: str, input_text: str, verbose: bool =
         # 创建修改后的sylib.h，将变量定义改为extern声明
         temp_sylib_h = os.path.join(temp_dir, 'sylib.h')
         try:
-            with open(sylib_h, 'r', encoding='utf-8') as f:
-                sylib_h_content = f.read()
-            
-            # 修改sylib.h内容，将变量定义改为extern声明
-            modified_sylib_h = sylib_h_content.replace(
-                'struct timeval _sysy_start, _sysy_end;',
-                'extern struct timeval _sysy_start, _sysy_end;'
-            ).replace(
-                'int _sysy_l1[_SYSY_N], _sysy_l2[_SYSY_N];',
-                'extern int _sysy_l1[_SYSY_N], _sysy_l2[_SYSY_N];'
-            ).replace(
-                'int _sysy_h[_SYSY_N], _sysy_m[_SYSY_N], _sysy_s[_SYSY_N], _sysy_us[_SYSY_N];',
-                'extern int _sysy_h[_SYSY_N], _sysy_m[_SYSY_N], _sysy_s[_SYSY_N], _sysy_us[_SYSY_N];'
-            ).replace(
-                'int _sysy_idx;',
-                'extern int _sysy_idx;'
-            )
+            modified_sylib_h = _get_modified_sylib_h()
             
             with open(temp_sylib_h, 'w', encoding='utf-8') as f:
                 f.write(modified_sylib_h)
@@ -306,9 +516,10 @@ def generate_reference_output(source_file: str, input_text: str, verbose: bool =
                 print(f"   {get_status_icon('failed')} {Colors.RED}创建修改后的sylib.h失败: {e}{Colors.RESET}")
             return None, None
         
-        # 一次编译链接所有文件
+        # 链接预编译的sylib.o，预编译失败时退回到直接编译sylib.c
+        sylib_obj = _get_sylib_object(compiler) or str(sylib_c)
         temp_program = os.path.join(temp_dir, 'temp_program')
-        compile_cmd = [compiler, temp_c_file, str(sylib_c), '-o', temp_program, '-lm']
+        compile_cmd = [compiler, temp_c_file, sylib_obj, '-o', temp_program, '-lm']
         
         if verbose:
             print(f"   {get_status_icon('compiling')} {Colors.CYAN}使用{compiler}编译参考程序{Colors.RESET}")
@@ -320,39 +531,58 @@ def generate_reference_output(source_file: str, input_text: str, verbose: bool =
             if verbose:
                 print(f"   {get_status_icon('failed')} {Colors.RED}参考程序编译失败{Colors.RESET}")
                 if stderr:
-                    print(f"   {Colors.RED}错误信息:{Colors.RESET}")
-                    for line in stderr.strip().split('\n')[:3]:  # 只显示前3行错误
-                        print(f"   {Colors.DIM}{line}{Colors.RESET}")
+                    # 只显示前3行错误
+                    _emit([f"   {Colors.RED}错误信息:{Colors.RESET}"] +
+                          [f"   {Colors.DIM}{line}{Colors.RESET}" for line in stderr.strip().split('\n')[:3]])
             return None, None
         
-        # 运行程序获取参考输出
-        if verbose:
-            print(f"\n{get_status_icon('running')} {Colors.MAGENTA}运行参考程序{Colors.RESET}")
-        
-        ref_returncode, ref_stdout, ref_stderr = run_command([temp_program], input_text, timeout=30)
+        _store_in_cache(temp_program, cached_program)
         
-        if verbose:
-            print(f"   {get_status_icon('info')}  参考程序退出码: {Colors.BOLD}{ref_returncode}{Colors.RESET}")
-            if ref_stdout:
-                print(f"   {Colors.BLUE}{Colors.BOLD}参考输出:{Colors.RESET}")
-                for line in ref_stdout.rstrip().split('\n'):
-                    print(f"   {line}")
-        
-        return ref_stdout.rstrip('\n') if ref_stdout else "", ref_returncode
+        # 运行程序获取参考输出
+        return _run_reference_program(temp_program, input_text, verbose)
+
+@functools.lru_cache(maxsize=32)
+def _read_input(path: str, mtime_ns: int, size: int) -> str:
+    """读取输入文件内容
+    
+    以(路径, 修改时间, 大小)为键缓存，多个测试共用同一输入文件时只读取一次，
+    文件被修改后键随之改变
+    """
+    with open(path, 'r') as f:
+        return f.read()
+
+def _read_input_file(input_file: Optional[str]) -> str:
+    """读取输入文件，未指定或文件不存在时返回空字符串"""
+    if not input_file:
+        return ""
+    # 直接stat，不存在时再处理，省去一次exists检查
+    try:
+        st = os.stat(input_file)
+    except FileNotFoundError:
+        return ""
+    return _read_input(input_file, st.st_mtime_ns, st.st_size)
 
 def single_test(source_file: str, compiler_cmd: List[str], lib_path: str, 
                 input_file: str = None, output_file: str = None, 
                 simulator: str = "qemu-riscv64", mode: str = "run",
-                verbose: bool = True, batch_mode: bool = False) -> Tuple[bool, str]:
+                verbose: bool = True, batch_mode: bool = False,
+                work_dir: Optional[str] = None, native: bool = False,
+                use_cache: bool = True, auto_detect: bool = True) -> Tuple[bool, str]:
     """单个文件测试
     Args:
         verbose: 是否显示详细输出，批量测试时可设为False
         batch_mode: 是否为批量测试模式，影响进度显示
+        work_dir: 存放中间文件的目录，批量测试时共用一个目录，不指定时创建临时目录
+        native: 跳过RISC-V工具链和模拟器，用clang/gcc编译的本地程序代替被测程序，
+                用于验证测试用例、期望输出和测试脚本本身
+        use_cache: 是否使用编译产物缓存
+        auto_detect: 未指定输入输出文件时是否自动查找同目录下的.in和.out文件，
+                     批量测试在收集测试时已经查找过，传入False
     Returns:
         (bool, str): (测试是否通过, 失败原因)
     """
     # 如果没有指定输入输出文件，自动查找同目录下的.in和.out文件
-    if input_file is None or output_file is None:
+    if auto_detect and (input_file is None or output_file is None):
         source_path = Path(source_file)
         base_name = source_path.stem
         dir_path = source_path.parent
@@ -370,54 +600,37 @@ def single_test(source_file: str, compiler_cmd: List[str], lib_path: str,
                 output_file = str(auto_out_file)
                 if verbose:
                     print(f"   {get_status_icon('info')} {Colors.CYAN}自动检测到输出文件{Colors.RESET}: {Colors.DIM}{output_file}{Colors.RESET}")
-    # 创建临时目录
-    with tempfile.TemporaryDirectory() as temp_dir:
-        base_name = Path(source_file).stem
+    if native and mode == "run":
+        input_text = _read_input_file(input_file)
+        stdout, returncode = generate_reference_output(source_file, input_text, verbose)
+        if stdout is None and returncode is None:
+            return False, "无法生成本地程序"
+        return check_program_output(source_file, output_file, input_text, returncode, stdout, "",
+                                    simulator, verbose, generate_reference=False)
+    
+    # 创建临时目录，指定了work_dir时直接使用，中间文件以测试名区分
+    base_name = Path(source_file).stem
+    if work_dir is None:
+        temp_dir_context = tempfile.TemporaryDirectory()
+    else:
+        temp_dir_context = contextlib.nullcontext(work_dir)
+    
+    with temp_dir_context as temp_dir:
         asm_file = os.path.join(temp_dir, f"{base_name}.s")
         program_file = os.path.join(temp_dir, f"{base_name}")
         
         # 如果是批量测试模式，更新状态显示
         if batch_mode and not verbose:
-            clear_line()
-            status_msg = f"{get_status_icon('compiling')} {Colors.YELLOW}编译中{Colors.RESET}: {Colors.DIM}{base_name}{Colors.RESET}"
-            print(status_msg, end='', flush=True)
-        
-        actual_compiler_cmd = compiler_cmd.copy()
-        # 编译生成汇编文件
-        if not compile_program(actual_compiler_cmd, source_file, asm_file, verbose=verbose):
-            if verbose:
-                colored_print(f"{base_name}: 失败 (编译错误)", Colors.RED)
-            # 获取错误信息
-            returncode, stdout, stderr = run_command(actual_compiler_cmd + [source_file, '-o', asm_file], timeout=60)
-            if stderr:
-                # 提取错误信息的前5行
-                error_lines = stderr.strip().split('\n')
-                error_msg = '\n'.join(error_lines[:5])
-            else:
-                error_msg = '编译失败'
-            return False, error_msg
-        
-        # 汇编链接
-        if batch_mode and not verbose:
-            clear_line()
-            status_msg = f"{get_status_icon('linking')} {Colors.BLUE}链接中{Colors.RESET}: {Colors.DIM}{base_name}{Colors.RESET}"
-            print(status_msg, end='', flush=True)
+            show_status(f"{get_status_icon('compiling')} {Colors.YELLOW}编译中{Colors.RESET}: {Colors.DIM}{base_name}{Colors.RESET}")
         
-        if not assemble_and_link(asm_file, lib_path, program_file, debug=(mode == "debug"), verbose=verbose):
+        # 编译生成汇编文件并汇编链接
+        failed_stage, stderr = build_program(compiler_cmd, source_file, lib_path, asm_file, program_file,
+                                             debug=(mode == "debug"), verbose=verbose, use_cache=use_cache)
+        if failed_stage:
             if verbose:
-                colored_print(f"{base_name}: 失败 (链接错误)", Colors.RED)
-            # 获取链接错误信息
-            cmd = ['riscv64-linux-gnu-gcc', '-static', '-march=rv64gc']
-            if mode == "debug":
-                cmd.extend(['-g', '-O0'])
-            cmd.extend([asm_file, lib_path, '-o', program_file])
-            returncode, stdout, stderr = run_command(cmd)
-            if stderr:
-                # 提取错误信息的前5行
-                error_lines = stderr.strip().split('\n')
-                error_msg = '\n'.join(error_lines[:5])
-            else:
-                error_msg = '链接失败'
+                colored_print(f"{base_name}: 失败 ({failed_stage}错误)", Colors.RED)
+            # 提取错误信息的前5行
+            error_msg = '\n'.join(stderr.strip().splitlines()[:5]) if stderr else f'{failed_stage}失败'
             return False, error_msg
         
         if mode == "debug":
@@ -455,8 +668,14 @@ def single_test(source_file: str, compiler_cmd: List[str], lib_path: str,
                 
                 # 启动gdb-multiarch并连接到远程调试服务器
                 colored_print("正在启动GDB调试器...", Colors.CYAN)
-                gdb_cmd = f"gdb-multiarch -ex 'target remote :{debug_port}' {program_file}"
-                os.system(gdb_cmd)
+                # 直接以参数列表启动gdb，不经过shell，文件名中的特殊字符不会被shell解释；
+                # gdb运行期间Ctrl+C只用于中断被调试程序，脚本自身忽略它 (与os.system的行为一致)。
+                # 这里不用os.execvp替换当前进程，否则gdb退出后无法关闭QEMU
+                previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: None)
+                try:
+                    subprocess.run(['gdb-multiarch', '-ex', f'target remote :{debug_port}', program_file])
+                finally:
+                    signal.signal(signal.SIGINT, previous_handler)
                 
             finally:
                 # 调试器退出后，检查并kill qemu进程
@@ -477,195 +696,671 @@ def single_test(source_file: str, compiler_cmd: List[str], lib_path: str,
             return True, ""
         
         # 准备输入
-        input_text = ""
-        if input_file and os.path.exists(input_file):
-            with open(input_file, 'r') as f:
-                input_text = f.read()
-        elif input_file is None and verbose:
+        input_text = _read_input_file(input_file)
+        if input_file is None and verbose:
             print(f"   {get_status_icon('info')}  {Colors.YELLOW}没有找到输入文件，程序将以空输入运行{Colors.RESET}")
         # 总是使用非交互模式来捕获输出进行比较
         
         # 运行程序
         if batch_mode and not verbose:
-            clear_line()
-            status_msg = f"{get_status_icon('running')} {Colors.MAGENTA}运行中{Colors.RESET}: {Colors.DIM}{base_name}{Colors.RESET}"
-            print(status_msg, end='', flush=True)
+            show_status(f"{get_status_icon('running')} {Colors.MAGENTA}运行中{Colors.RESET}: {Colors.DIM}{base_name}{Colors.RESET}")
         
         if verbose:
             print(f"\n{get_status_icon('running')} {Colors.MAGENTA}{Colors.BOLD}运行程序{Colors.RESET}")
             print(f"   {Colors.DIM}命令: {simulator} {os.path.basename(program_file)}{Colors.RESET}")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         returncode, stdout, stderr = run_program(program_file, input_text, simulator, interactive=False)
-        end_time = time.time()
+        end_time = time.perf_counter()
         
         if verbose:
             print(f"   {get_status_icon('info')}  运行时间: {Colors.BOLD}{end_time - start_time:.3f}s{Colors.RESET}, 退出码: {Colors.BOLD}{returncode}{Colors.RESET}")
         
-        if stderr and verbose:
-            print(f"\n   {Colors.YELLOW}{Colors.BOLD}标准错误:{Colors.RESET}")
-            for line in stderr.strip().split('\n'):
-                print(f"   {Colors.DIM}{line}{Colors.RESET}")
-        
-        # 如果模拟器不存在，直接返回失败
-        if returncode == -1 and f"not found" in stderr:
-            if verbose:
-                print(f"\n{get_status_icon('failed')} {Colors.RED}{Colors.BOLD}测试失败: 模拟器不存在{Colors.RESET}")
-            return False, f"模拟器 {simulator} 不存在"
-        
-        if stdout and verbose:
-            print(f"\n   {Colors.BLUE}{Colors.BOLD}标准输出:{Colors.RESET}")
-            for line in stdout.rstrip().split('\n'):
-                print(f"   {line}")
-        
-        # 检查输出 - 如果没有期望输出文件，使用clang/gcc生成参考输出
-        expected_stdout = ""
-        expected_returncode = None
-        
-        if output_file and os.path.exists(output_file):
+        return check_program_output(source_file, output_file, input_text, returncode, stdout, stderr,
+                                    simulator, verbose)
+
+def check_program_output(source_file: str, output_file: Optional[str], input_text: str,
+                         returncode: int, stdout: str, stderr: str,
+                         simulator: str = "qemu-riscv64", verbose: bool = True,
+                         generate_reference: bool = True) -> Tuple[bool, str]:
+    """检查程序的运行结果是否与期望输出一致
+    
+    没有期望输出文件时使用clang/gcc生成参考输出
+    Args:
+        generate_reference: 没有期望输出文件时是否生成参考输出，被测程序本身就是
+                            clang/gcc编译的本地程序时传入False，否则只是和自己比较
+    Returns:
+        (bool, str): (测试是否通过, 失败原因)
+    """
+    if stderr and verbose:
+        _emit([f"\n   {Colors.YELLOW}{Colors.BOLD}标准错误:{Colors.RESET}"] +
+              [f"   {Colors.DIM}{line}{Colors.RESET}" for line in stderr.strip().split('\n')])
+    
+    # 如果模拟器不存在，直接返回失败
+    if returncode == -1 and f"not found" in stderr:
+        if verbose:
+            print(f"\n{get_status_icon('failed')} {Colors.RED}{Colors.BOLD}测试失败: 模拟器不存在{Colors.RESET}")
+        return False, f"模拟器 {simulator} 不存在"
+    
+    if stdout and verbose:
+        _emit([f"\n   {Colors.BLUE}{Colors.BOLD}标准输出:{Colors.RESET}"] +
+              [f"   {line}" for line in stdout.rstrip().split('\n')])
+    
+    # 检查输出 - 如果没有期望输出文件，使用clang/gcc生成参考输出
+    expected_stdout = ""
+    expected_returncode = None
+    
+    # 直接打开期望输出文件，不存在时再生成参考输出，省去一次exists检查；
+    # 文本模式读取时\r\n已统一转换为\n
+    expected_content = None
+    if output_file:
+        try:
             with open(output_file, 'r') as f:
-                expected_content = f.read().splitlines()
-            
-            # 解析期望输出：最后一行是返回值，前面的是stdout
-            if len(expected_content) > 0:
-                expected_returncode = expected_content[-1].strip()
-                if len(expected_content) > 1:
-                    expected_stdout = "\n".join(expected_content[:-1]).rstrip('\n')
-                elif len(expected_content) == 1:
-                    # 只有一行，说明没有stdout，只有返回值
-                    expected_stdout = ""
-        else:
-            # 如果没有期望输出文件，使用clang/gcc生成参考输出
+                expected_content = f.read()
+        except FileNotFoundError:
+            pass
+    
+    if expected_content is not None:
+        # 解析期望输出：最后一行是返回值，前面的是stdout；
+        # 直接按最后一个换行符切分，不把整个文件拆成行再拼接
+        if expected_content:
+            if expected_content.endswith('\n'):
+                expected_content = expected_content[:-1]
+            last_newline = expected_content.rfind('\n')
+            expected_returncode = expected_content[last_newline + 1:].strip()
+            # 只有一行时说明没有stdout，只有返回值
+            expected_stdout = expected_content[:last_newline].rstrip('\n') if last_newline >= 0 else ""
+    else:
+        # 如果没有期望输出文件，使用clang/gcc生成参考输出
+        if generate_reference:
             if verbose:
                 print(f"   {get_status_icon('info')}  {Colors.YELLOW}未找到期望输出文件，使用clang/gcc生成参考输出{Colors.RESET}")
-            
             expected_stdout, expected_returncode = generate_reference_output(source_file, input_text, verbose)
-            if expected_stdout is None and expected_returncode is None:
+            skip_reason = "无法生成参考输出"
+        else:
+            expected_stdout, expected_returncode = None, None
+            skip_reason = "未找到期望输出文件，没有可比较的参考输出"
+        
+        if expected_stdout is None and expected_returncode is None:
+            if verbose:
+                print(f"   {get_status_icon('warning')} {Colors.YELLOW}{skip_reason}，跳过输出比较{Colors.RESET}")
+            # 没有参考输出时，只检查程序是否成功运行
+            if returncode != 0:
                 if verbose:
-                    print(f"   {get_status_icon('warning')} {Colors.YELLOW}无法生成参考输出，跳过输出比较{Colors.RESET}")
-                # 无法生成参考输出时，只检查程序是否成功运行
-                if returncode != 0:
-                    return False, f"程序运行失败 (退出码: {returncode})"
-                else:
-                    if verbose:
-                        print(f"\n{get_status_icon('passed')} {Colors.GREEN}{Colors.BOLD}测试通过{Colors.RESET} ✓")
-                    return True, ""
-        
-        # 如果有期望输出（来自文件或clang/gcc），进行比较
-        if expected_stdout is not None or expected_returncode is not None:
-            # 比较stdout - 注意处理空字符串情况
-            stdout_matched = True
-            if expected_stdout is not None:
-                # 保持原始格式进行比较，但移除末尾的换行符以匹配期望格式
-                actual_stdout = stdout.rstrip('\n') if stdout else ""
-                stdout_matched = compare_output(expected_stdout, actual_stdout, show_diff=verbose)
-            
-            # 比较返回值
-            returncode_matched = True
-            if expected_returncode is not None:
-                try:
-                    expected_returncode_int = int(expected_returncode)
-                    returncode_matched = returncode == expected_returncode_int
-                except (ValueError, TypeError):
-                    returncode_matched = str(returncode) == str(expected_returncode)
-            
-            if not stdout_matched or not returncode_matched:
+                    print(f"\n{get_status_icon('failed')} {Colors.RED}{Colors.BOLD}测试失败: 程序运行失败 (退出码: {returncode}){Colors.RESET}")
+                return False, f"程序运行失败 (退出码: {returncode})"
+            else:
                 if verbose:
-                    print(f"\n{get_status_icon('failed')} {Colors.RED}{Colors.BOLD}测试失败{Colors.RESET}")
-                    if not stdout_matched:
-                        print(f"   {Colors.RED}✗ 标准输出不匹配{Colors.RESET}")
-                    if not returncode_matched:
-                        print(f"   {Colors.RED}✗ 返回值不匹配{Colors.RESET}")
-                        print(f"     期望: {Colors.CYAN}{expected_returncode}{Colors.RESET}")
-                        print(f"     实际: {Colors.CYAN}{returncode}{Colors.RESET}")
-                
-                # 生成简洁的错误消息用于批量测试显示
-                error_msg = ""
+                    print(f"\n{get_status_icon('passed')} {Colors.GREEN}{Colors.BOLD}测试通过{Colors.RESET} ✓")
+                return True, ""
+    
+    # 如果有期望输出（来自文件或clang/gcc），进行比较
+    if expected_stdout is not None or expected_returncode is not None:
+        # 比较stdout - 注意处理空字符串情况
+        stdout_matched = True
+        if expected_stdout is not None:
+            # 保持原始格式进行比较，但移除末尾的换行符以匹配期望格式
+            actual_stdout = stdout.rstrip('\n') if stdout else ""
+            stdout_matched = compare_output(expected_stdout, actual_stdout, show_diff=verbose)
+        
+        # 比较返回值
+        returncode_matched = True
+        if expected_returncode is not None:
+            try:
+                expected_returncode_int = int(expected_returncode)
+                returncode_matched = returncode == expected_returncode_int
+            except (ValueError, TypeError):
+                returncode_matched = str(returncode) == str(expected_returncode)
+        
+        if not stdout_matched or not returncode_matched:
+            if verbose:
+                print(f"\n{get_status_icon('failed')} {Colors.RED}{Colors.BOLD}测试失败{Colors.RESET}")
                 if not stdout_matched:
-                    error_msg = "输出不匹配"
-                    # 如果输出较短，可以显示部分差异
-                    actual_stdout = stdout.rstrip('\n') if stdout else ""
-                    if expected_stdout and len(expected_stdout) < 50 and len(actual_stdout) < 50:
-                        error_msg += f" (期望: {repr(expected_stdout[:30])}, 实际: {repr(actual_stdout[:30])})"
+                    print(f"   {Colors.RED}✗ 标准输出不匹配{Colors.RESET}")
                 if not returncode_matched:
-                    if error_msg:
-                        error_msg += "; "
-                    error_msg += f"返回值不匹配 (期望: {expected_returncode}, 实际: {returncode})"
-                return False, error_msg
-        
-        if verbose:
-            print(f"\n{get_status_icon('passed')} {Colors.GREEN}{Colors.BOLD}测试通过{Colors.RESET} ✓")
-        return True, ""
+                    print(f"   {Colors.RED}✗ 返回值不匹配{Colors.RESET}")
+                    print(f"     期望: {Colors.CYAN}{expected_returncode}{Colors.RESET}")
+                    print(f"     实际: {Colors.CYAN}{returncode}{Colors.RESET}")
+            
+            # 生成简洁的错误消息用于批量测试显示
+            error_msg = ""
+            if not stdout_matched:
+                error_msg = "输出不匹配"
+                # 如果输出较短，可以显示部分差异
+                actual_stdout = stdout.rstrip('\n') if stdout else ""
+                if expected_stdout and len(expected_stdout) < 50 and len(actual_stdout) < 50:
+                    error_msg += f" (期望: {repr(expected_stdout[:30])}, 实际: {repr(actual_stdout[:30])})"
+            if not returncode_matched:
+                if error_msg:
+                    error_msg += "; "
+                error_msg += f"返回值不匹配 (期望: {expected_returncode}, 实际: {returncode})"
+            return False, error_msg
+    
+    if verbose:
+        print(f"\n{get_status_icon('passed')} {Colors.GREEN}{Colors.BOLD}测试通过{Colors.RESET} ✓")
+    return True, ""
+
+def _run_one(source_file: str, compiler_cmd: List[str], lib_path: str,
+             input_file: Optional[str], output_file: Optional[str],
+             simulator: str, work_dir: str, native: bool = False,
+             use_cache: bool = True) -> Tuple[str, bool, str, float]:
+    """批量测试的工作函数，在线程池中执行单个测试
+    Returns:
+        (str, bool, str, float): (测试名, 测试是否通过, 失败原因, 耗时)
+    """
+    base_name = Path(source_file).stem
+    start_time = time.perf_counter()
+    test_result, error_msg = single_test(source_file, compiler_cmd, lib_path, input_file, output_file,
+                                         simulator, mode="run", verbose=False, batch_mode=False,
+                                         work_dir=work_dir, native=native, use_cache=use_cache,
+                                         auto_detect=False)
+    return base_name, test_result, error_msg, time.perf_counter() - start_time
+
+def _build_one(source_file: str, compiler_cmd: List[str], lib_path: str,
+               work_dir: str, use_cache: bool = True,
+               asm_ready: bool = False) -> Tuple[Optional[str], str, float]:
+    """批量运行模式的工作函数，只编译链接不运行
+    
+    asm_ready为True时汇编文件已由_batch_compile放在工作目录中，只需汇编链接
+    Returns:
+        (Optional[str], str, float): (可执行文件路径，失败时为None, 失败原因, 耗时)
+    """
+    start_time = time.perf_counter()
+    base_name = Path(source_file).stem
+    asm_file = os.path.join(work_dir, f"{base_name}.s")
+    program_file = os.path.join(work_dir, base_name)
+    
+    failed_stage, stderr = build_program(compiler_cmd, source_file, lib_path, asm_file, program_file,
+                                         verbose=False, use_cache=use_cache, asm_ready=asm_ready)
+    if failed_stage:
+        error_msg = '\n'.join(stderr.strip().splitlines()[:5]) if stderr else f'{failed_stage}失败'
+        return None, error_msg, time.perf_counter() - start_time
+    
+    return program_file, "", time.perf_counter() - start_time
+
+# 批量运行模式中每个程序的运行时间上限(秒)，与run_command的默认超时一致
+_BATCH_PROGRAM_TIMEOUT = 60
+# timeout命令在程序超时时返回的退出码
+_TIMEOUT_EXIT_CODE = 124
+
+def _run_batch(programs: List[Tuple[str, Optional[str]]], simulator: str,
+               work_dir: str) -> Optional[List[Optional[Tuple[int, str]]]]:
+    """在一个shell进程中依次运行多个程序，省去每个程序单独启动子进程的开销
+    
+    programs中每项为(可执行文件, 输入文件)，有输入文件时按文本模式读入后写到work_dir，再重定向为程序的标准输入。
+    每个程序运行结束后输出一行随机分隔符和退出码，据此切分各程序的标准输出。
+    qemu-user无法在一个进程中连续执行多个客户程序，因此脚本由宿主机的/bin/sh执行；
+    每个程序由timeout单独限制运行时间，脚本在新的会话中运行，超时时连同子进程一起结束
+    Returns:
+        每个程序的(退出码, 标准输出)，单个程序超时或退出码无法确定时该项为None；
+        批量运行失败或整个脚本超时时返回None
+    """
+    import uuid  # 只有批量运行模式用到，延迟导入
+    separator = f"__TEST_SEP_{uuid.uuid4().hex}__"
+    script_file = os.path.join(work_dir, f"{separator}.sh")
+    with open(script_file, 'w') as f:
+        for index, (program, input_file) in enumerate(programs):
+            stdin = '/dev/null'
+            if input_file:
+                # 与run_command相同，按文本模式读入后再编码，保证两条路径喂给程序的字节一致
+                stdin = os.path.join(work_dir, f"{separator}.{index}.in")
+                with open(stdin, 'wb') as input_f:
+                    input_f.write(_read_input_file(input_file).encode())
+                stdin = shlex.quote(stdin)
+            f.write(f"timeout {_BATCH_PROGRAM_TIMEOUT} {shlex.quote(simulator)} {shlex.quote(program)} "
+                    f"<{stdin} 2>/dev/null\n")
+            f.write(f"printf '\\n{separator}:%d\\n' $?\n")
+    
+    returncode, stdout, stderr = run_command(['/bin/sh', script_file],
+                                             timeout=(_BATCH_PROGRAM_TIMEOUT + 5) * len(programs),
+                                             new_session=True)
+    if returncode != 0:
+        return None
+    
+    # chunks[0]是第一个程序的输出，之后每段为"退出码\n下一个程序的输出"
+    chunks = stdout.split(f"\n{separator}:")
+    if len(chunks) != len(programs) + 1:
+        return None
+    
+    results = []
+    program_stdout = chunks[0]
+    for chunk in chunks[1:]:
+        rc_text, _, next_stdout = chunk.partition('\n')
+        returncode = int(rc_text)
+        # 124表示被timeout结束，大于128表示被信号128+N结束，但两者也都可能是程序自己的返回值
+        # (main返回-1时为255)，shell的退出状态无法区分，交给单独运行的路径判断
+        if returncode == _TIMEOUT_EXIT_CODE or returncode > 128:
+            results.append(None)
+        else:
+            results.append((returncode, program_stdout))
+        program_stdout = next_stdout
+    return results
+
+def _check_one(source_file: str, input_file: Optional[str], output_file: Optional[str],
+               simulator: str, build_result: Tuple[Optional[str], str, float],
+               run_result: Optional[Tuple[int, str]]) -> Tuple[str, bool, str, float]:
+    """批量运行模式的工作函数，检查已编译程序的运行结果
+    
+    run_result为None时单独运行该程序
+    """
+    base_name = Path(source_file).stem
+    program_file, error_msg, elapsed = build_result
+    if program_file is None:
+        return base_name, False, error_msg, elapsed
+    
+    start_time = time.perf_counter()
+    input_text = _read_input_file(input_file)
+    
+    if run_result is None:
+        returncode, stdout, stderr = run_program(program_file, input_text, simulator)
+    else:
+        returncode, stdout = run_result
+        stderr = ""
+    
+    test_result, error_msg = check_program_output(source_file, output_file, input_text, returncode, stdout, stderr,
+                                                  simulator, verbose=False)
+    return base_name, test_result, error_msg, elapsed + time.perf_counter() - start_time
+
+def _check_many(check_args: List[tuple]) -> List[Tuple[str, bool, str, float]]:
+    """依次检查一组测试的运行结果，参数与_check_one相同"""
+    return [_check_one(*args) for args in check_args]
+
+def _group_duplicate_tasks(tasks: List[tuple]) -> List[List[int]]:
+    """按源文件和输入文件的内容对测试分组，内容完全相同的测试分在一组
+    Returns:
+        各组测试在tasks中的下标，按首次出现的顺序排列
+    """
+    groups = {}
+    for i, (source_file, _, _, input_file, _, _) in enumerate(tasks):
+        with open(source_file, 'rb') as f:
+            source_digest = hashlib.blake2b(f.read()).digest()
+        input_digest = None
+        if input_file:
+            with open(input_file, 'rb') as f:
+                input_digest = hashlib.blake2b(f.read()).digest()
+        groups.setdefault((source_digest, input_digest), []).append(i)
+    return list(groups.values())
+
+def _run_group(group_tasks: List[tuple], work_dir: str, native: bool = False,
+               assume_deterministic: bool = False, use_cache: bool = True,
+               asm_ready: bool = False) -> List[Tuple[str, bool, str, float]]:
+    """批量测试的工作函数，运行一组源文件和输入完全相同的测试，只编译链接一次
+    
+    其余成员默认用同一程序重新运行以验证结果，assume_deterministic为True时
+    直接复用第一个测试的运行结果，各成员仍与各自的期望输出比较；
+    asm_ready为True时汇编文件已经生成，只需汇编链接
+    """
+    if len(group_tasks) == 1 and not asm_ready:
+        return [_run_one(*group_tasks[0], work_dir, native, use_cache)]
+    
+    source_file, compiler_cmd, lib_path, input_file, _, simulator = group_tasks[0]
+    build_result = _build_one(source_file, compiler_cmd, lib_path, work_dir, use_cache, asm_ready)
+    run_result = None
+    if build_result[0] is not None and assume_deterministic:
+        returncode, stdout, _ = run_program(build_result[0], _read_input_file(input_file), simulator)
+        run_result = (returncode, stdout)
+    
+    return _check_many([(member_source, member_input, member_output, member_simulator, build_result, run_result)
+                        for member_source, _, _, member_input, member_output, member_simulator in group_tasks])
+
+def _submit_batch_run(executor: ThreadPoolExecutor, tasks: List[tuple], work_dir: str,
+                      groups: List[List[int]], jobs: int, use_cache: bool = True,
+                      asm_ready: frozenset = frozenset()) -> List[Future]:
+    """批量运行模式: 先并行编译所有测试，再把程序平均分给jobs个shell进程，各自依次运行
+    
+    内容相同的一组测试只编译一次，asm_ready中的测试已经生成汇编文件，只需汇编链接
+    Returns:
+        与groups一一对应的future列表，结果为该组各测试的结果列表，格式与_run_one相同
+    """
+    build_futures = {group[0]: executor.submit(_build_one, *tasks[group[0]][:3], work_dir, use_cache,
+                                                   group[0] in asm_ready)
+                     for group in groups}
+    total = len(build_futures)
+    for built, _ in enumerate(as_completed(build_futures.values()), start=1):
+        show_status(f"{get_status_icon('compiling')} 编译中 {get_progress_bar(built, total)} [{built}/{total}]")
+    build_results = [None] * len(tasks)
+    for group in groups:
+        for i in group:
+            build_results[i] = build_futures[group[0]].result()
+    
+    # 批量运行所有编译成功的程序，输入文件由shell重定向；需要timeout命令限制每个程序的运行时间，
+    # 没有时全部单独运行
+    batchable = [i for i, build_result in enumerate(build_results) if build_result[0] is not None]
+    run_results = {}
+    if batchable and _which('timeout'):
+        show_status(f"{get_status_icon('running')} 批量运行中: {len(batchable)} 个程序")
+        simulator = tasks[0][5]
+        chunk_size = -(-len(batchable) // jobs)
+        chunks = [batchable[i:i + chunk_size] for i in range(0, len(batchable), chunk_size)]
+        batch_futures = [executor.submit(_run_batch, [(build_results[i][0], tasks[i][3]) for i in chunk],
+                                         simulator, work_dir)
+                         for chunk in chunks]
+        for chunk, future in zip(chunks, batch_futures):
+            batch_results = future.result()
+            if batch_results is not None:
+                run_results.update((i, result) for i, result in zip(chunk, batch_results) if result is not None)
+    
+    return [executor.submit(_check_many, [(tasks[i][0], tasks[i][3], tasks[i][4], tasks[i][5],
+                                           build_results[i], run_results.get(i)) for i in group])
+            for group in groups]
+
+def _batch_compile(executor: ThreadPoolExecutor, tasks: List[tuple], work_dir: str,
+                   groups: List[List[int]], jobs: int, use_cache: bool = True) -> frozenset:
+    """批量编译模式: 每次编译器调用编译一批源文件，省去逐个启动编译器的开销
+    
+    汇编文件放在与_build_one相同的位置，每组只编译第一个测试；已有缓存的可执行文件
+    的测试不参与编译。编译失败的批次交给之后的逐个编译处理并报告错误
+    Returns:
+        已生成汇编文件的测试在tasks中的下标
+    """
+    indices = [group[0] for group in groups
+               if not (use_cache and _artifact_cache_path(*tasks[group[0]][:3]).exists())]
+    if not indices:
+        return frozenset()
+    
+    # 按并行任务数平均分批，但每批最多2倍CPU核心数个文件：批中任一文件编译失败时整批都要
+    # 逐个重新编译，批次过大时(如--jobs 1)一个编译错误就会让整个测试集编译两遍
+    chunk_size = min(-(-len(indices) // jobs), 2 * (os.cpu_count() or 1))
+    chunks = [indices[i:i + chunk_size] for i in range(0, len(indices), chunk_size)]
+    futures = []
+    for chunk in chunks:
+        # 随机目录名，不会与以测试名命名的中间文件冲突
+        out_dir = tempfile.mkdtemp(prefix='batch-compile-', dir=work_dir)
+        futures.append(executor.submit(compile_program_batch, tasks[chunk[0]][1],
+                                       [tasks[i][0] for i in chunk], out_dir))
+    
+    for done, _ in enumerate(as_completed(futures), start=1):
+        show_status(f"{get_status_icon('compiling')} 批量编译中 {get_progress_bar(done, len(futures))} "
+                    f"[{done}/{len(futures)}]")
+    
+    asm_ready = set()
+    for chunk, future in zip(chunks, futures):
+        for i, asm_file in zip(chunk, future.result()):
+            if asm_file is None:
+                continue
+            os.replace(asm_file, os.path.join(work_dir, f"{Path(tasks[i][0]).stem}.s"))
+            asm_ready.add(i)
+    return frozenset(asm_ready)
+
+def _stat_key(path: str) -> bytes:
+    """用文件的修改时间和大小代表其内容，文件不存在时返回空"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return b''
+    return f"{st.st_mtime_ns}:{st.st_size}".encode()
+
+def _compiler_key(compiler_cmd: List[str], lib_path: str) -> List[bytes]:
+    """编译命令和静态库对应的缓存键组成部分
+    
+    编译器可执行文件以及编译命令中出现的文件 (如 python compiler.py 中的脚本)
+    按修改时间和大小计算
+    """
+    parts = [repr(compiler_cmd).encode()]
+    if compiler_cmd:
+        parts.append(_stat_key(_which(compiler_cmd[0]) or compiler_cmd[0]))
+    parts.extend(_stat_key(arg) for arg in compiler_cmd[1:] if os.path.isfile(arg))
+    parts.append(_stat_key(lib_path))
+    return parts
+
+def _artifact_cache_path(source_file: str, compiler_cmd: List[str], lib_path: str) -> Path:
+    """编译产物(可执行文件)的缓存路径，由源文件内容、编译命令和静态库共同决定
+    
+    每个(源文件路径, 编译命令)对应一个目录，目录中只保留最新的可执行文件，
+    见_store_artifact
+    """
+    entry_dir = _cache_path('artifacts', os.path.abspath(source_file), *compiler_cmd)
+    version = _cache_path('artifacts', _file_digest(source_file),
+                          *(part.decode() for part in _compiler_key(compiler_cmd, lib_path)))
+    return entry_dir / version.name
+
+def _store_artifact(program_file: str, cache_file: Path):
+    """缓存可执行文件，并删除同一目录中旧的版本
+    
+    编译器每次重新构建后缓存键都会改变，不删除的话每个测试都会多留下一个静态链接的
+    可执行文件，缓存随之无限增长
+    """
+    _store_in_cache(program_file, cache_file)
+    try:
+        for old_file in cache_file.parent.iterdir():
+            # 跳过其他进程正在写入的临时文件
+            if old_file != cache_file and not old_file.name.endswith('.tmp'):
+                old_file.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+def _cache_key(source_file: str, compiler_cmd: List[str], lib_path: str,
+               input_file: Optional[str], output_file: Optional[str], simulator: str) -> str:
+    """计算测试结果缓存的键，任一输入发生变化时键都会改变
+    
+    源文件和输入/输出文件按内容计算，编译命令部分见_compiler_key
+    """
+    h = hashlib.blake2b()
+    
+    def add(data: bytes):
+        h.update(data)
+        h.update(b'\0')
+    
+    for path in (source_file, input_file, output_file):
+        if path:
+            with open(path, 'rb') as f:
+                add(f.read())
+        else:
+            add(b'')
+    
+    for part in _compiler_key(compiler_cmd, lib_path):
+        add(part)
+    add(simulator.encode())
+    
+    # 没有期望输出文件时结果还取决于生成参考输出用的运行时库
+    try:
+        add(''.join(_sylib_digests()).encode())
+    except FileNotFoundError:
+        add(b'')
+    return h.hexdigest()
+
+def _load_result_cache() -> dict:
+    """读取测试结果缓存，文件不存在或损坏时返回空字典
+    
+    格式为{源文件绝对路径: [缓存键, 是否通过]}，其他格式的项 (如旧版本按缓存键记录的结果) 被丢弃
+    """
+    import json  # 结果缓存只在批量测试时使用，延迟导入以缩短单个测试的启动时间
+    try:
+        with open(RESULT_CACHE_FILE, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(results, dict):
+        return {}
+    return {source: entry for source, entry in results.items()
+            if isinstance(entry, list) and len(entry) == 2}
+
+def _save_result_cache(results: dict):
+    """写入测试结果缓存"""
+    import json
+    
+    def write(temp_file: str):
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f)
+    
+    _write_cache_file(RESULT_CACHE_FILE, write)
+
+def _warmup(simulator: str):
+    """批量测试开始前运行一次模拟器和链接器并读取运行时库，
+    让这些文件进入页缓存，避免各个并行任务在冷缓存下重复读盘"""
+    run_command([simulator, '--version'], timeout=10)
+    run_command(['riscv64-linux-gnu-gcc', '--version'], timeout=10)
+    sylib_c, _ = _sylib_paths()
+    try:
+        with open(sylib_c, 'rb') as f:
+            f.read()
+    except OSError:
+        pass
+
+def _print_test_result(completed: int, total: int, base_name: str, test_result: bool,
+                       error_msg: str, note: str):
+    """打印批量测试中单个测试的结果行"""
+    clear_line()
+    if test_result:
+        result_icon = get_status_icon('passed')
+        result_color = Colors.GREEN
+        result_text = "PASS"
+    else:
+        result_icon = get_status_icon('failed')
+        result_color = Colors.RED
+        result_text = "FAIL"
+    # 格式化的测试结果
+    output = [f"{result_icon} [{completed:3d}/{total}] {base_name:<40} {result_color}{Colors.BOLD}[{result_text}]{Colors.RESET} {Colors.DIM}{note}{Colors.RESET}"]
+    # 失败原因
+    if not test_result and error_msg:
+        # 处理多行错误信息，每行都要正确缩进
+        error_lines = error_msg.split('\n')
+        for i, line in enumerate(error_lines[:5]):  # 最多显示5行
+            if i == 0:
+                output.append(f"    {Colors.GRAY}↳ {line}{Colors.RESET}")
+            else:
+                output.append(f"      {Colors.GRAY}{line}{Colors.RESET}")
+    _emit(output)
 
 def batch_test(test_dir: str, compiler_cmd: List[str], lib_path: str, 
-               simulator: str = "qemu-riscv64") -> Tuple[int, int]:
-    """批量测试"""
+               simulator: str = "qemu-riscv64", jobs: Optional[int] = None,
+               batch_run: bool = False, use_cache: bool = True,
+               force: bool = False, native: bool = False,
+               assume_deterministic: bool = False, batch_compile: bool = False) -> Tuple[int, int]:
+    """批量测试
+    Args:
+        jobs: 并行任务数，默认为CPU核心数
+        batch_run: 是否在一个shell进程中依次运行所有测试程序
+        use_cache: 是否读写测试结果缓存，输入未变化且上次通过的测试直接计为通过
+        force: 忽略已缓存的结果重新运行所有测试，但仍然更新缓存
+        native: 用clang/gcc编译的本地程序代替被测程序，此时不使用结果缓存
+        assume_deterministic: 源文件和输入都相同的测试直接复用同一次运行的结果
+        batch_compile: 每次编译器调用编译一批源文件，要求编译器支持多个输入文件
+    """
     test_path = Path(test_dir)
     if not test_path.exists() or not test_path.is_dir():
         colored_print(f"测试目录不存在: {test_dir}", Colors.RED, bold=True)
         return 0, 0
     
-    sy_files = sorted(list(test_path.glob("*.sy")))  # 按文件名排序
+    # 一次扫描目录同时得到.sy文件列表和全部文件名，之后用集合查找对应的.in/.out文件
+    entries = set()
+    sy_files = []
+    with os.scandir(test_dir) as it:
+        for entry in it:
+            entries.add(entry.name)
+            if entry.name.endswith('.sy') and entry.is_file():
+                sy_files.append(entry.path)
+    sy_files.sort()  # 按文件名排序
     if not sy_files:
         colored_print(f"目录中没有找到.sy文件: {test_dir}", Colors.RED, bold=True)
         return 0, 0
     
+    # 每个测试都是编译/链接/模拟器子进程，线程足以让它们并行执行；
+    # 测试比核心少时不必开多余的线程
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(sy_files)))
+    
     # 显示测试开始信息
     print(f"\n{Colors.BLUE}{'━' * 60}{Colors.RESET}")
     print(f"{get_status_icon('testing')} {Colors.BLUE}{Colors.BOLD}开始批量测试{Colors.RESET}")
     print(f"   📁 测试目录: {Colors.DIM}{test_dir}{Colors.RESET}")
     print(f"   📄 测试文件: {Colors.BOLD}{len(sy_files)}{Colors.RESET} 个")
+    print(f"   ⚙️  并行任务: {Colors.BOLD}{jobs}{Colors.RESET} 个")
     print(f"{Colors.BLUE}{'━' * 60}{Colors.RESET}\n")
     
+    tasks = []
+    for sy_file in sy_files:
+        base_name = os.path.splitext(os.path.basename(sy_file))[0]
+        in_name = f"{base_name}.in"
+        out_name = f"{base_name}.out"
+        
+        input_file = os.path.join(test_dir, in_name) if in_name in entries else None
+        output_file = os.path.join(test_dir, out_name) if out_name in entries else None
+        tasks.append((sy_file, compiler_cmd, lib_path, input_file, output_file, simulator))
+    
     passed = 0
     failed = 0
+    total = len(tasks)
+    completed = 0
     
-    for i, sy_file in enumerate(sy_files):
-        base_name = sy_file.stem
-        in_file = test_path / f"{base_name}.in"
-        out_file = test_path / f"{base_name}.out"
-        
-        input_file = str(in_file) if in_file.exists() else None
-        output_file = str(out_file) if out_file.exists() else None
-        
-        # 更新进度显示
-        progress = i + 1
-        progress_bar = get_progress_bar(i, len(sy_files))
-        percent = (i / len(sy_files)) * 100
-        
-        # 测试前显示当前测试项
-        clear_line()
-        status_text = f"{get_status_icon('testing')} 测试中 {progress_bar} {percent:5.1f}% [{progress}/{len(sy_files)}] {Colors.CYAN}{base_name}{Colors.RESET}"
-        print(status_text, end='', flush=True)
-        
-        # 执行测试
-        test_result, error_msg = single_test(str(sy_file), compiler_cmd, lib_path, input_file, output_file, simulator, mode="run", verbose=False, batch_mode=True)
-        
-        # 显示测试结果
-        clear_line()
-        if test_result:
-            result_icon = get_status_icon('passed')
-            result_color = Colors.GREEN
-            result_text = "PASS"
+    # 本地运行的结果不代表被测编译器，不读写结果缓存
+    if native:
+        use_cache = False
+        batch_run = False
+        batch_compile = False
+    
+    # 跳过输入未变化且上次通过的测试；每个源文件只记录最近一次的(缓存键, 是否通过)，
+    # 新结果覆盖旧结果，编译器反复重新构建时缓存文件也不会增长
+    result_cache = _load_result_cache() if use_cache else {}
+    cache_keys = ([(os.path.abspath(task[0]), _cache_key(*task)) for task in tasks] if use_cache
+                  else [None] * total)
+    pending = []
+    for task, key in zip(tasks, cache_keys):
+        if not force and key is not None and result_cache.get(key[0]) == [key[1], True]:
+            completed += 1
             passed += 1
-            # 打印格式化的测试结果
-            print(f"{result_icon} [{progress:3d}/{len(sy_files)}] {base_name:<40} {result_color}{Colors.BOLD}[{result_text}]{Colors.RESET}")
+            _print_test_result(completed, total, Path(task[0]).stem, True, "", "缓存")
         else:
-            result_icon = get_status_icon('failed')
-            result_color = Colors.RED
-            result_text = "FAIL"
-            failed += 1
-            # 打印格式化的测试结果
-            print(f"{result_icon} [{progress:3d}/{len(sy_files)}] {base_name:<40} {result_color}{Colors.BOLD}[{result_text}]{Colors.RESET}")
-            # 显示失败原因
-            if error_msg:
-                # 处理多行错误信息，每行都要正确缩进
-                error_lines = error_msg.split('\n')
-                for i, line in enumerate(error_lines[:5]):  # 最多显示5行
-                    if i == 0:
-                        print(f"    {Colors.GRAY}↳ {line}{Colors.RESET}")
+            pending.append((task, key))
+    
+    if pending and not native:
+        _warmup(simulator)
+    
+    # 所有测试共用一个临时目录，结束时统一清理
+    with tempfile.TemporaryDirectory() as work_dir, ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            pending_tasks = [task for task, _ in pending]
+            # 源文件和输入完全相同的测试分为一组，只编译链接一次
+            if native:
+                groups = [[i] for i in range(len(pending_tasks))]
+            else:
+                groups = _group_duplicate_tasks(pending_tasks)
+            
+            asm_ready = frozenset()
+            if batch_compile and pending_tasks:
+                asm_ready = _batch_compile(executor, pending_tasks, work_dir, groups, jobs, use_cache)
+            
+            if batch_run and pending_tasks:
+                futures = _submit_batch_run(executor, pending_tasks, work_dir, groups, jobs, use_cache, asm_ready)
+            else:
+                # 每个工作线程独立完成一组测试的编译、链接和运行，不同测试的各个阶段自然交错：
+                # 一个测试在模拟器中运行时，其他线程的编译器已在编译后续测试，无需单独的流水线
+                futures = [executor.submit(_run_group, [pending_tasks[i] for i in group], work_dir, native,
+                                           assume_deterministic, use_cache, group[0] in asm_ready)
+                           for group in groups]
+            future_keys = {future: [pending[i][1] for i in group] for future, group in zip(futures, groups)}
+            
+            # 结果按完成顺序显示，计数只在主线程中更新
+            last_progress = 0.0
+            for future in as_completed(futures):
+                for (base_name, test_result, error_msg, elapsed), key in zip(future.result(), future_keys[future]):
+                    completed += 1
+                    if test_result:
+                        passed += 1
                     else:
-                        print(f"      {Colors.GRAY}{line}{Colors.RESET}")
+                        failed += 1
+                    if key is not None:
+                        source, cache_key = key
+                        result_cache[source] = [cache_key, test_result]
+                    
+                    # 显示测试结果
+                    _print_test_result(completed, total, base_name, test_result, error_msg, f"{elapsed:.2f}s")
+                
+                # 更新进度显示，测试很多时限制刷新频率
+                now = time.monotonic()
+                if completed < total and now - last_progress >= _PROGRESS_INTERVAL:
+                    last_progress = now
+                    progress_bar = get_progress_bar(completed, total)
+                    percent = (completed / total) * 100
+                    show_status(f"{get_status_icon('testing')} 测试中 {progress_bar} {percent:5.1f}% [{completed}/{total}]")
+        except KeyboardInterrupt:
+            # 退出with时线程池默认等待队列中的全部测试完成，Ctrl+C时取消尚未开始的测试，
+            # 并结束终端信号到不了的批量运行脚本，立即退出
+            executor.shutdown(wait=False, cancel_futures=True)
+            _kill_sessions()
+            raise
+    
+    if use_cache:
+        _save_result_cache(result_cache)
     
     # 测试结果总结
     print()  # 空行
@@ -705,115 +1400,171 @@ def batch_test(test_dir: str, compiler_cmd: List[str], lib_path: str,
     
     return passed, failed
 
+def _format_ns(ns: float) -> str:
+    """把纳秒数格式化为秒"""
+    return f"{ns / 1e9:.3f}s"
+
+# QEMU libinsn插件在程序退出时输出的指令总数
+_INSN_COUNT_RE = re.compile(r'insns:\s*(\d+)')
+
 def benchmark_test(source_file: str, compiler_cmds: List[List[str]], lib_path: str, 
-                   input_file: str = None, simulator: str = "qemu-riscv64", runs: int = 3):
-    """性能对比测试"""
+                   input_file: str = None, simulator: str = "qemu-riscv64", runs: int = 3,
+                   insn_plugin: Optional[str] = None, use_cache: bool = True):
+    """性能对比测试
+    Args:
+        insn_plugin: QEMU的libinsn.so插件路径，指定时额外统计程序执行的指令数，
+                     不受模拟器启动时间的影响，并按指令数排序
+        use_cache: 是否使用编译产物缓存
+    """
+    import statistics  # 只有bench模式用到，延迟导入
+    
     colored_print(f"性能对比测试: {source_file}", Colors.MAGENTA, bold=True)
     colored_print(f"运行次数: {runs}", Colors.BLUE)
     colored_print(f"对比编译器数量: {len(compiler_cmds)}", Colors.BLUE)
     
+    simulator_args = ['-plugin', insn_plugin, '-d', 'plugin'] if insn_plugin else None
+    
     results = {}
+    failures = {}  # 编译器名 -> 失败原因，不参与排名
+    base_name = Path(source_file).stem
+    input_text = _read_input_file(input_file)
     
-    for i, compiler_cmd in enumerate(compiler_cmds):
-        compiler_name = f"编译器{i+1}: {' '.join(compiler_cmd)}"
-        colored_print(f"\n测试 {compiler_name}", Colors.CYAN, bold=True)
-        
-        times = []
-        success_count = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 各编译器的编译链接互不相关，先并行全部完成，再依次计时，避免编译进程干扰计时
+        colored_print("并行编译中...", Colors.YELLOW)
+        # 完全相同的编译命令只构建一次，共用同一个可执行文件
+        unique_cmds = list(dict.fromkeys(tuple(compiler_cmd) for compiler_cmd in compiler_cmds))
+        with ThreadPoolExecutor(max_workers=min(len(unique_cmds), os.cpu_count() or 1)) as executor:
+            build_futures = {cmd: executor.submit(_build_one, source_file, list(cmd), lib_path,
+                                                  tempfile.mkdtemp(dir=work_dir), use_cache)
+                             for cmd in unique_cmds}
+        builds = [build_futures[tuple(compiler_cmd)].result() for compiler_cmd in compiler_cmds]
         
-        for run in range(runs):
-            colored_print(f"第 {run+1} 次运行...", Colors.YELLOW)
+        for i, (compiler_cmd, (program_file, error_msg, _)) in enumerate(zip(compiler_cmds, builds)):
+            compiler_name = f"编译器{i+1}: {' '.join(compiler_cmd)}"
+            colored_print(f"\n测试 {compiler_name}", Colors.CYAN, bold=True)
             
-            with tempfile.TemporaryDirectory() as temp_dir:
-                base_name = Path(source_file).stem
-                asm_file = os.path.join(temp_dir, f"{base_name}.s")
-                program_file = os.path.join(temp_dir, f"{base_name}")
-                
-                if not compile_program(compiler_cmd, source_file, asm_file, verbose=False):
-                    continue
-                
-                if not assemble_and_link(asm_file, lib_path, program_file, debug=False, verbose=False):
-                    continue
-                
-                # 准备输入
-                input_text = ""
-                if input_file and os.path.exists(input_file):
-                    with open(input_file, 'r') as f:
-                        input_text = f.read()
+            times = []  # 单位: 纳秒，只在显示时换算为秒
+            insn_counts = []
+            success_count = 0
+            
+            if program_file is None:
+                colored_print("编译链接失败", Colors.RED, bold=True)
+                _emit([f"   {Colors.DIM}{line}{Colors.RESET}" for line in error_msg.splitlines()])
+                failures[compiler_name] = "编译链接失败"
+                continue
+            
+            # 预热运行一次，不计入结果，避免冷缓存影响第一次的计时
+            colored_print("预热运行...", Colors.YELLOW)
+            run_program(program_file, input_text, simulator, simulator_args=simulator_args, discard_stdout=True)
+            
+            for run in range(runs):
+                colored_print(f"第 {run+1} 次运行...", Colors.YELLOW)
                 
-                # 运行并计时
-                start_time = time.time()
-                returncode, stdout, stderr = run_program(program_file, input_text, simulator)
-                end_time = time.time()
+                # 运行并计时，计时运行不比较输出，标准输出直接丢弃；
+                # 标准错误保留给指令数统计插件
+                start_ns = time.perf_counter_ns()
+                returncode, _, stderr = run_program(program_file, input_text, simulator,
+                                                    simulator_args=simulator_args, discard_stdout=True)
+                elapsed_ns = time.perf_counter_ns() - start_ns
                 
                 if returncode == 0:
-                    times.append(end_time - start_time)
+                    times.append(elapsed_ns)
                     success_count += 1
-                    colored_print(f"  运行时间: {end_time - start_time:.3f}s", Colors.GREEN)
+                    colored_print(f"  运行时间: {_format_ns(elapsed_ns)}", Colors.GREEN)
+                    insn_match = _INSN_COUNT_RE.search(stderr) if insn_plugin else None
+                    if insn_match:
+                        insn_counts.append(int(insn_match.group(1)))
+                        colored_print(f"  指令数: {insn_counts[-1]}", Colors.GREEN)
                 else:
                     colored_print(f"  运行失败 (退出码: {returncode})", Colors.RED)
         
-        if times:
-            avg_time = sum(times) / len(times)
-            min_time = min(times)
-            max_time = max(times)
+            if times:
+                # 模拟器的运行时间是长尾分布，用中位数代表典型耗时
+                median_time = statistics.median(times)
+                # 标准差表示运行间的波动，差距小于它的对比结果没有意义
+                stdev_time = statistics.pstdev(times) if len(times) > 1 else 0.0
+                avg_time = sum(times) / len(times)
+                min_time = min(times)
+                max_time = max(times)
             
-            results[compiler_name] = {
-                'avg': avg_time,
-                'min': min_time,
-                'max': max_time,
-                'success_rate': success_count / runs
-            }
+                results[compiler_name] = {
+                    'median': median_time,
+                    'stdev': stdev_time,
+                    'avg': avg_time,
+                    'min': min_time,
+                    'max': max_time,
+                    'insns': sum(insn_counts) // len(insn_counts) if insn_counts else None,
+                    'success_rate': success_count / runs
+                }
             
-            colored_print(f"平均时间: {avg_time:.3f}s", Colors.GREEN)
-            colored_print(f"最短时间: {min_time:.3f}s", Colors.GREEN)
-            colored_print(f"最长时间: {max_time:.3f}s", Colors.GREEN)
-            colored_print(f"成功率: {success_count}/{runs}", Colors.GREEN)
-        else:
-            colored_print("所有运行都失败了", Colors.RED, bold=True)
+                colored_print(f"中位时间: {_format_ns(median_time)} ± {_format_ns(stdev_time)}", Colors.GREEN)
+                colored_print(f"平均时间: {_format_ns(avg_time)}", Colors.GREEN)
+                if insn_counts:
+                    colored_print(f"平均指令数: {results[compiler_name]['insns']}", Colors.GREEN)
+                colored_print(f"最短时间: {_format_ns(min_time)}", Colors.GREEN)
+                colored_print(f"最长时间: {_format_ns(max_time)}", Colors.GREEN)
+                colored_print(f"成功率: {success_count}/{runs}", Colors.GREEN)
+            else:
+                colored_print("所有运行都失败了", Colors.RED, bold=True)
+                failures[compiler_name] = f"所有运行都失败了 (0/{runs})"
     
     # 显示对比结果
-    if len(results) > 1:
+    if results and len(results) + len(failures) > 1:
         colored_print(f"\n{'='*60}", Colors.BLUE)
         colored_print("性能对比结果", Colors.BLUE, bold=True)
         colored_print(f"{'='*60}", Colors.BLUE)
         
-        sorted_results = sorted(results.items(), key=lambda x: x[1]['avg'])
+        # 所有编译器都统计到指令数时按指令数排序，否则按中位时间排序
+        rank_key = 'insns' if all(result['insns'] for result in results.values()) else 'median'
+        sorted_results = sorted(results.items(), key=lambda x: x[1][rank_key])
         
         for i, (name, result) in enumerate(sorted_results):
             rank_color = Colors.GREEN if i == 0 else Colors.YELLOW if i == 1 else Colors.RED
             colored_print(f"{i+1}. {name}", rank_color, bold=True)
-            colored_print(f"   平均时间: {result['avg']:.3f}s", rank_color)
+            colored_print(f"   中位时间: {_format_ns(result['median'])} ± {_format_ns(result['stdev'])}", rank_color)
+            colored_print(f"   平均时间: {_format_ns(result['avg'])}", rank_color)
+            if result['insns']:
+                colored_print(f"   平均指令数: {result['insns']}", rank_color)
             colored_print(f"   成功率: {result['success_rate']:.1%}", rank_color)
             
             if i > 0:
-                speedup = sorted_results[0][1]['avg'] / result['avg']
+                speedup = sorted_results[0][1][rank_key] / result[rank_key]
                 colored_print(f"   相对最快: {speedup:.2f}x", rank_color)
+        
+        for name, reason in failures.items():
+            colored_print(f"✗ {name}", Colors.RED, bold=True)
+            colored_print(f"   {reason}", Colors.RED)
+
+def _positive_int(value: str) -> int:
+    """argparse类型: 正整数"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"需要正整数: {value}")
+    return number
 
 def parse_compiler_args(args: List[str]) -> Tuple[List[str], Optional[str], Optional[str]]:
-    """解析命令行参数，分离编译器参数和输入/输出文件参数"""
-    input_file = None
-    output_file = None
-    compiler_args = []
+    """解析命令行参数，分离编译器参数和输入/输出文件参数
     
-    i = 0
-    while i < len(args):
-        arg = args[i]
-        if arg == '--in' and i + 1 < len(args):
-            input_file = args[i+1]
-            i += 2
-        elif arg == '--out' and i + 1 < len(args):
-            output_file = args[i+1]
-            i += 2
-        elif arg == '--':
-            # 剩余的都是编译器参数
-            compiler_args.extend(args[i+1:])
-            break
-        else:
+    "--"之后的参数原样作为编译器参数，只在它之前查找--in和--out
+    """
+    split = args.index('--') if '--' in args else len(args)
+    options, compiler_tail = args[:split], args[split + 1:]
+    
+    files = {'--in': None, '--out': None}
+    compiler_args = []
+    option_iter = iter(options)
+    for arg in option_iter:
+        value = next(option_iter, None) if arg in files else None
+        if value is None:
             compiler_args.append(arg)
-            i += 1
+        else:
+            files[arg] = value
     
-    return compiler_args, input_file, output_file
+    return compiler_args + compiler_tail, files['--in'], files['--out']
 
 def find_free_port(start_port=1234, max_attempts=100):
     """找到一个未被占用的端口"""
@@ -836,36 +1587,62 @@ def get_script_dir():
     """获取脚本所在的目录"""
     return Path(__file__).parent.absolute()
 
-def main():
-    script_dir = get_script_dir()
-    default_lib = str(script_dir / 'lib' / 'libsysy_riscv.a')
+# --stdin-loop模式下每条命令结束后输出的标记行，后跟该命令的退出码
+_LOOP_SENTINEL = "__TEST_PY_DONE__"
 
-    parser = argparse.ArgumentParser(description="编译器测试脚本", 
-                                   add_help=False)  # 禁用默认的--help
+def _parse_argv(parser: argparse.ArgumentParser, argv: List[str]) -> Tuple[argparse.Namespace, List[str]]:
+    """解析已知参数，返回(已知参数, 剩余参数)
     
-    # 添加自定义帮助选项
-    parser.add_argument('--help', action='help', help='显示帮助信息并退出')
-    
-    # 主参数
-    parser.add_argument('command', choices=['run', 'debug', 'bench'], help='命令: run(运行), debug(调试), bench(性能测试)')
-    parser.add_argument('source', help='源文件或目录')
-    parser.add_argument('--lib', default=default_lib, help=f'静态库路径 (默认: {default_lib})')
-    parser.add_argument('--simulator', default='qemu-riscv64', help='模拟器 (默认: qemu-riscv64)')
-    parser.add_argument('--runs', type=int, default=3, help='benchmark运行次数 (默认: 3)')
-    
-    # 使用parse_known_args先解析已知参数
-    args, remaining = parser.parse_known_args()
+    "--"紧跟位置参数时parse_known_args会把它吞掉，因此先在第一个"--"处切开，
+    只解析之前的部分，"--"及之后的参数原样放进剩余参数交给parse_compiler_args
+    """
+    split = argv.index('--') if '--' in argv else len(argv)
+    args, remaining = parser.parse_known_args(argv[:split])
+    return args, remaining + argv[split:]
+
+def _stdin_loop(parser: argparse.ArgumentParser) -> int:
+    """逐行读取标准输入中的参数并执行，整个过程只启动一次Python解释器
     
+    每行的格式与命令行参数相同 (不含test.py本身)，空行和#开头的行被忽略
+    """
+    for line in sys.stdin:
+        argv = shlex.split(line, comments=True)
+        if not argv:
+            continue
+        try:
+            args, remaining = _parse_argv(parser, argv)
+            if args.stdin_loop or args.command is None or args.source is None:
+                parser.error("需要指定command和source参数")
+            returncode = _run_args(args, remaining)
+        except SystemExit as e:
+            # 参数错误和--help会调用sys.exit，只结束当前这一条
+            returncode = e.code if isinstance(e.code, int) else 1
+        print(f"{_LOOP_SENTINEL} {returncode}", flush=True)
+    return 0
+
+def _run_args(args: argparse.Namespace, remaining: List[str]) -> int:
+    """根据解析后的参数执行一次测试，返回退出码"""
     # 解析剩余参数中的--in和--out
     compiler_args, input_file, output_file = parse_compiler_args(remaining)
     
+    # 模拟器只在启动时查找一次，之后都使用绝对路径；本地运行和调试模式不使用该模拟器
+    if not args.native and args.command != 'debug':
+        simulator_path = _which(args.simulator)
+        if not simulator_path:
+            colored_print(f"错误: 模拟器 '{args.simulator}' 不存在或不在PATH中", Colors.RED, bold=True)
+            return 1
+        args.simulator = simulator_path
+    
     # 检查是否为目录（批量测试）
     if os.path.isdir(args.source):
         if args.command != 'run':
             colored_print(f"错误: {args.command}模式不支持批量运行", Colors.RED, bold=True)
             return 1
         
-        passed, failed = batch_test(args.source, compiler_args, args.lib, args.simulator)
+        passed, failed = batch_test(args.source, compiler_args, args.lib, args.simulator, args.jobs, args.batch_run,
+                                    use_cache=not args.no_cache, force=args.force, native=args.native,
+                                    assume_deterministic=args.assume_deterministic,
+                                    batch_compile=args.batch_compile)
         return 0 if failed == 0 else 1
     
     # 单个文件测试
@@ -898,15 +1675,57 @@ def main():
         benchmark_test(args.source, compiler_cmds, args.lib, 
                       input_file,
                       args.simulator,
-                      args.runs)
+                      args.runs,
+                      args.insn_plugin,
+                      use_cache=False)
+        return 0
     else:
+        # 编译产物缓存只在批量测试中使用：单文件测试通常是刚改完编译器，
+        # 而cargo run、python -m等包装命令背后的编译器变化无法从命令本身察觉
         success, _ = single_test(args.source, compiler_args, args.lib, 
                             input_file,
                             output_file,
                             args.simulator,
                             args.command,
-                            verbose=True)
+                            verbose=True,
+                            native=args.native,
+                            use_cache=False)
         return 0 if success else 1
 
+def main():
+    script_dir = get_script_dir()
+    default_lib = str(script_dir / 'lib' / 'libsysy_riscv.a')
+
+    parser = argparse.ArgumentParser(description="编译器测试脚本", 
+                                   add_help=False,  # 禁用默认的--help
+                                   allow_abbrev=False)  # 否则--in会被当成--insn-plugin的缩写
+    
+    # 添加自定义帮助选项
+    parser.add_argument('--help', action='help', help='显示帮助信息并退出')
+    
+    # 主参数，--stdin-loop模式下从每行输入中读取
+    parser.add_argument('command', nargs='?', choices=['run', 'debug', 'bench'], help='命令: run(运行), debug(调试), bench(性能测试)')
+    parser.add_argument('source', nargs='?', help='源文件或目录')
+    parser.add_argument('--lib', default=default_lib, help=f'静态库路径 (默认: {default_lib})')
+    parser.add_argument('--simulator', default='qemu-riscv64', help='模拟器 (默认: qemu-riscv64)')
+    parser.add_argument('--runs', type=int, default=3, help='benchmark运行次数 (默认: 3)')
+    parser.add_argument('--jobs', type=_positive_int, default=None, help='批量测试并行任务数 (默认: CPU核心数)')
+    parser.add_argument('--batch-compile', action='store_true', help='批量测试时每次调用编译器编译一批源文件 (编译器需支持多个输入文件，不带-o时生成<文件名>.s)')
+    parser.add_argument('--batch-run', action='store_true', help='批量测试时先编译全部测试，再把程序分给--jobs个shell进程依次运行')
+    parser.add_argument('--no-cache', action='store_true', help='批量测试时不读取也不写入测试结果和编译产物缓存')
+    parser.add_argument('--force', action='store_true', help='批量测试时忽略已缓存的结果，重新运行所有测试')
+    parser.add_argument('--assume-deterministic', action='store_true', help='批量测试时源文件和输入都相同的测试直接复用同一次运行的结果')
+    parser.add_argument('--native', action='store_true', help='run模式下跳过RISC-V工具链，直接运行clang/gcc编译的本地程序，用于验证测试用例')
+    parser.add_argument('--insn-plugin', default=None, help='bench模式下通过QEMU插件统计指令数，参数为libinsn.so的路径')
+    parser.add_argument('--stdin-loop', action='store_true', help='从标准输入逐行读取参数并依次执行，每条结束后输出一行结束标记和退出码')
+    
+    # 使用parse_known_args先解析已知参数
+    args, remaining = _parse_argv(parser, sys.argv[1:])
+    if args.stdin_loop:
+        return _stdin_loop(parser)
+    if args.command is None or args.source is None:
+        parser.error("需要指定command和source参数")
+    return _run_args(args, remaining)
+
 if __name__ == "__main__":
     sys.exit(main())